@@ -8,6 +8,9 @@ Konstanten für Emulated SunSpec WR
 LIVE = True    # True = EVCC Live Daten (WebSocket)
               # False = statische Demo-Werte
 
+DEBUG = False  # True = Debug-Logs (Register-Checks beim Start, WS-Details)
+              # False = nur INFO und höher
+
 # ====================================================
 # EVCC VERBINDUNG
 # ====================================================
@@ -49,19 +52,21 @@ WS_OPEN_TIMEOUT = 10               # Timeout beim Verbinden (Sekunden)
 WS_PING_INTERVAL = 30              # Heartbeat-Frequenz (Sekunden)
 WS_PING_TIMEOUT = 10               # Ping-Response Timeout (Sekunden)
 WS_MAX_SIZE = 1_000_000            # Maximale Nachrichtengröße (Bytes)
-WS_QUEUE_MAX_SIZE = 100            # Maximale Queue-Größe (Messages)
+WS_FLUSH_INTERVAL = 0.2            # Mindestabstand zwischen Register-Updates (Sekunden)
 
 # ====================================================
 # BACKOFF KONFIGURATION
 # ====================================================
-WS_BACKOFF_BASE = 1                # Basis-Backoff (Sekunden)
+WS_BACKOFF_INITIAL = 5             # Max. zufällige Wartezeit beim ersten Fehler (Sekunden)
+WS_BACKOFF_MIN = 1.92              # Startwert, wird pro weiterem Fehler multipliziert (Sekunden)
+WS_BACKOFF_FACTOR = 1.618          # Faktor pro weiterem Fehler
 WS_BACKOFF_MAX = 60                # Maximales Backoff (Sekunden)
 
 # ====================================================
 # VERSION
 # ====================================================
 VERSION = "v0.1.0"
-VERSION_INFO = "Code Cleanup, Thread-Safe Register Updates, Konsistenz-Verbesserungen"
+VERSION_INFO = "Code Cleanup, Register-Updates im gemeinsamen Event Loop (kein Lock), Konsistenz-Verbesserungen"
 
 # ====================================================
 # SUNSPEC REGISTER MAPPING
@@ -74,3 +79,4 @@ AC_POWER_ADDR = 0x9C93             # AC Total Power
 TOTAL_ENERGY_ADDR = 0x9C9D         # Total Energy (32-bit)
 VPV1_ADDR = 0x9CA2                 # VPV1 (DC Voltage)
 TEMPERATURE_ADDR = 0x9CA7          # Temperatur
+SUNSPEC_MAP_END = 0x9CC6           # Ende des bedienten Bereichs (exklusiv): Model 103 bis 0x9CB8 + End-Marker + Reserve
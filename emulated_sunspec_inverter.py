@@ -35,23 +35,48 @@ ARCHITEKTUR:
 └──────────────────────────────────────────────────────────────┘
 
 Port: 5202 (Modbus TCP)
-Version: v0.1.0 - Thread-Safe Register Updates & Cleanup
+Version: v0.1.0 - Register-Updates im gemeinsamen Event Loop (kein Lock) & Cleanup
 """
 
 import asyncio
+import functools
 import json
 import logging
 import random
-import threading
+import struct
+import sys
 import websockets
-from pymodbus.server.sync import StartTcpServer
+from array import array
+from pymodbus.server.async_io import StartTcpServer
 from pymodbus.datastore import ModbusSlaveContext, ModbusServerContext
 from pymodbus.datastore import ModbusSequentialDataBlock
 from const import *  # Importiere alle Konstanten
 
+try:
+    from orjson import loads as json_loads  # Optional: deutlich schnellerer JSON-Parser
+except ImportError:
+    from json import loads as json_loads
+
 # ========== LOGGING ==========
 logging.basicConfig(level=logging.INFO)
 _LOGGER = logging.getLogger(__name__)
+# DEBUG gilt nur für dieses Script: pymodbus/websockets bleiben auf INFO
+# (pymodbus-Debug wären mehrere Zeilen pro Modbus-Anfrage)
+_LOGGER.setLevel(logging.DEBUG if DEBUG else logging.INFO)
+
+class _CanceledHandlerFilter(logging.Filter):
+    """Unterdrückt "Handler for stream [...] has been canceled" von pymodbus
+
+    pymodbus 2.5.3 (async_io) loggt diese Meldung als ERROR bei jedem normalen
+    Client-Disconnect (zweimal pro Verbindung). Kein Fehler, füllt aber das
+    Container-Log bei jedem Reconnect von EVCC/EME20.
+    """
+
+    def filter(self, record):
+        msg = record.getMessage()
+        return not (msg.startswith("Handler for stream") and msg.endswith("has been canceled"))
+
+logging.getLogger("pymodbus.server.async_io").addFilter(_CanceledHandlerFilter())
 
 # ====================================================
 # Dynamische Werte (zur Laufzeit aktualisiert)
@@ -59,82 +84,131 @@ _LOGGER = logging.getLogger(__name__)
 # Diese Variablen werden von EVCC WebSocket gefüllt
 current_power_w = STATIC_VALUES["power_w"]       # aktuelle Leistung
 current_energy_kwh = STATIC_VALUES["energy_kwh"] # Gesamtenergie
-register_lock = threading.Lock()
+
+# Zuletzt in die Register geschriebene Werte (None = noch nie geschrieben)
+_last_power_w = None
+_last_energy_kwh = None
 
 # ====================================================
 # Hilfsfunktionen
 # ====================================================
 
+@functools.cache
 def str_to_regs(s, num_regs):
-    """String → SunSpec Register (2 Bytes pro Register, Big Endian)"""
-    regs = []
-    s_padded = s.ljust(num_regs * 2, '\x00')
-    for i in range(num_regs):
-        hi = ord(s_padded[i * 2])
-        lo = ord(s_padded[i * 2 + 1])
-        regs.append((hi << 8) | lo)
-    return regs
+    """String → SunSpec Register (2 Bytes pro Register, Big Endian)
 
-# ====================================================
-# Register-Update Funktionen (dynamische Werte)
-# ====================================================
+    Liefert ein (gecachtes, unveränderliches) Tuple.
+    """
+    # Zeichen außerhalb von Latin-1 werden zu '?' statt einen Fehler auszulösen
+    s_padded = s.encode('latin-1', errors='replace').ljust(num_regs * 2, b'\x00')
+    # unpack_from ignoriert überzählige Bytes → zu lange Strings werden abgeschnitten
+    return struct.unpack_from(f'>{num_regs}H', s_padded)
 
-def _update_power_register(power_w):
-    """Interne Aktualisierung des SunSpec AC Power Registers (0x9C93)"""
-    global sunspec_registers, holding
+def energy_to_regs(energy_kwh):
+    """kWh → Total Energy Register (Wh als 32-bit, Big Endian) → (high, low)"""
+    # kWh → Wh (1:1 Mapping ohne Berechnungen)
+    energy_wh = int(energy_kwh * 1000)
 
-    # 16-bit signed integer (für negative Werte)
-    if power_w < 0:
-        power_w = (1 << 16) + int(power_w)
-    else:
-        power_w = int(power_w) & 0xFFFF
+    # 32-bit in zwei 16-bit Register aufteilen
+    return (energy_wh >> 16) & 0xFFFF, energy_wh & 0xFFFF
 
-    sunspec_registers[AC_POWER_ADDR] = power_w
-    sunspec_registers[AC_POWER_ADDR + 1] = 0x0000  # Scale Factor
+# ====================================================
+# Modbus Datenblock
+# ====================================================
 
-    # Auch in Holding-Array aktualisieren (mit +1 Offset)
-    holding[AC_POWER_ADDR + 1] = power_w
-    holding[AC_POWER_ADDR + 2] = 0x0000
+class SunSpecDataBlock(ModbusSequentialDataBlock):
+    """Sequentieller Datenblock direkt auf dem Holding-Array (ohne Kopie)
+
+    ModbusSequentialDataBlock kopiert die übergebenen Werte in eine eigene
+    Liste. Dieser Block arbeitet stattdessen auf dem übergebenen Array, damit
+    Register-Updates nur noch an einer Stelle geschrieben werden müssen.
+    Das Array ist ein array('H') (uint16, 2 Bytes pro Register).
+
+    Der bediente Bereich kann unterhalb des Arrays beginnen (served_start):
+    Register dort existieren nicht im Array und lesen sich als 0.
+    """
+
+    def __init__(self, address, values, served_start=None):
+        self.address = address
+        self.values = values
+        self.default_value = 0
+        self._end = address + len(values)  # Länge des Arrays ändert sich nie
+        self._start = address if served_start is None else served_start
+
+    def validate(self, address, count=1):
+        """Prüft ob die Anfrage im bedienten Registerbereich liegt"""
+        return self._start <= address and address + count <= self._end
+
+    def getValues(self, address, count=1):
+        """Register als Liste von ints (pymodbus erwartet eine Liste)"""
+        start = address - self.address
+        if start >= 0:
+            return self.values[start:start + count].tolist()
+        
+        # Anfrage beginnt vor dem Array: fehlende Register mit 0 auffüllen
+        values = self.values[:max(0, start + count)].tolist()
+        return [0] * (count - len(values)) + values
+
+    def setValues(self, address, values):
+        """Register schreiben (Slice-Zuweisung auf array('H') braucht ein array)
+
+        pymodbus übergibt immer eine Liste (auch FC6 schreibt [value]),
+        daher keine Sonderbehandlung für Einzelwerte. Register vor dem
+        Array werden nicht gespeichert (lesen sich weiterhin als 0).
+        """
+        start = address - self.address
+        if start < 0:
+            values = values[-start:]
+            start = 0
+        self.values[start:start + len(values)] = array('H', values)
+
+def get_register(addr):
+    """Aktuellen Wert eines SunSpec Registers lesen (Modbus-Adresse)
+
+    Adressen vor register_base liegen nicht im Array und lesen sich wie
+    über Modbus als 0 (ein negativer Index würde sonst von hinten lesen).
+    """
+    index = addr - register_base
+    return holding[index] if index >= 0 else 0
 
-    # Datastore direkt aktualisieren (falls holding kopiert wurde)
-    store_ref = globals().get("store")
-    if store_ref is not None:
-        store_ref.setValues(3, AC_POWER_ADDR, [power_w, 0x0000])
+# ====================================================
+# Register-Update Funktionen (dynamische Werte)
+# ====================================================
 
-def update_power_register(power_w):
-    """Thread-sicheres Update des SunSpec AC Power Registers (0x9C93)"""
-    with register_lock:
-        _update_power_register(power_w)
+# Kein Lock nötig: Register-Updates und Modbus-Lesezugriffe laufen im selben
+# Event Loop und können sich daher nie überschneiden (auch kein "torn read"
+# der beiden 16-bit Hälften des 32-bit Energie-Werts)
 
-def _update_energy_register(energy_kwh):
-    """Interne Aktualisierung des SunSpec Total Energy Registers (0x9C9D) - 32-bit"""
-    global sunspec_registers, holding
+def update_power_register(power_w):
+    """Update des SunSpec AC Power Registers (0x9C93)"""
+    global _last_power_w
 
-    # kWh → Wh (1:1 Mapping ohne Berechnungen)
-    energy_wh = int(energy_kwh * 1000)
+    # Unveränderter Wert → Register sind bereits aktuell
+    if power_w == _last_power_w:
+        return
+    _last_power_w = power_w
 
-    # 32-bit in zwei 16-bit Register aufteilen (Big Endian)
-    high = (energy_wh >> 16) & 0xFFFF
-    low = energy_wh & 0xFFFF
+    # Holding-Array ist zugleich der Modbus-Datastore
+    # (Scale Factor bei AC_POWER_ADDR + 1 ist statisch und wird nur beim Start gesetzt)
+    # & 0xFFFF liefert für negative Werte direkt das 16-bit Zweierkomplement
+    holding[AC_POWER_ADDR - register_base] = int(power_w) & 0xFFFF
 
-    sunspec_registers[TOTAL_ENERGY_ADDR] = high
-    sunspec_registers[TOTAL_ENERGY_ADDR + 1] = low
-    sunspec_registers[TOTAL_ENERGY_ADDR + 2] = 0x0000  # Scale Factor
+def update_energy_register(energy_kwh):
+    """Update des SunSpec Total Energy Registers (0x9C9D) - 32-bit"""
+    global _last_energy_kwh
 
-    # Auch in Holding-Array aktualisieren (mit +1 Offset)
-    holding[TOTAL_ENERGY_ADDR + 1] = high
-    holding[TOTAL_ENERGY_ADDR + 2] = low
-    holding[TOTAL_ENERGY_ADDR + 3] = 0x0000
+    # Unveränderter Wert (pvEnergy steigt nur langsam) → nichts zu tun
+    if energy_kwh == _last_energy_kwh:
+        return
+    _last_energy_kwh = energy_kwh
 
-    # Datastore direkt aktualisieren (falls holding kopiert wurde)
-    store_ref = globals().get("store")
-    if store_ref is not None:
-        store_ref.setValues(3, TOTAL_ENERGY_ADDR, [high, low, 0x0000])
+    high, low = energy_to_regs(energy_kwh)
 
-def update_energy_register(energy_kwh):
-    """Thread-sicheres Update des SunSpec Total Energy Registers (0x9C9D)"""
-    with register_lock:
-        _update_energy_register(energy_kwh)
+    # Holding-Array ist zugleich der Modbus-Datastore
+    # (Scale Factor bei TOTAL_ENERGY_ADDR + 2 ist statisch und wird nur beim Start gesetzt)
+    start = TOTAL_ENERGY_ADDR - register_base
+    holding[start] = high
+    holding[start + 1] = low
 
 def update_registers_from_values():
     """Update alle dynamischen Register basierend auf current_* Variablen"""
@@ -147,8 +221,12 @@ def update_registers_from_values():
 # EVCC WebSocket Integration (Production-Grade)
 # ====================================================
 
+# Schlüssel, die _is_relevant_update akzeptiert (als JSON-Key mit Anführungszeichen)
+_RELEVANT_KEYS = ('"site"', '"grid"', '"pvEnergy"')
+_RELEVANT_KEYS_BYTES = tuple(key.encode() for key in _RELEVANT_KEYS)
+
 class EvccWebsocketClient:
-    """Robuster WebSocket-Client mit Reconnect, Message Queue und Deduplication"""
+    """Robuster WebSocket-Client mit Reconnect, Latest-Wins Puffer und Deduplication"""
     
     def __init__(self, host, port, coordinator_callback):
         self.url = f"ws://{host}:{port}/ws"  # ⭐ EVCC WebSocket Endpoint
@@ -157,11 +235,15 @@ class EvccWebsocketClient:
         self._consumer_task = None
         self._ws = None
         self._running = False
-        self._message_queue = asyncio.Queue(maxsize=WS_QUEUE_MAX_SIZE)
+        self._latest_power = None           # Neuestes, noch nicht verarbeitetes grid.power
+        self._latest_energy = None          # Neuestes, noch nicht verarbeitetes pvEnergy
+        self._latest_event = asyncio.Event()  # Gesetzt, sobald neue Werte vorliegen
         self._last_signature = None
         
-        # Backoff-Konfiguration (exponentiell bis 60s)
-        self._backoff_base = WS_BACKOFF_BASE
+        # Backoff-Konfiguration (exponentiell bis 60s, Algorithmus wie python-websockets)
+        self._backoff_initial = WS_BACKOFF_INITIAL
+        self._backoff_min = WS_BACKOFF_MIN
+        self._backoff_factor = WS_BACKOFF_FACTOR
         self._backoff_max = WS_BACKOFF_MAX
     
     async def connect(self):
@@ -202,12 +284,12 @@ class EvccWebsocketClient:
         self._task = None
         self._consumer_task = None
         self._ws = None
-        self._clear_queue()
+        self._clear_latest()
         _LOGGER.info("WebSocket-Client getrennt")
     
     async def _run(self):
         """Hauptschleife: Verbinde, empfange Nachrichten, Reconnect bei Fehler"""
-        backoff = self._backoff_base
+        backoff = self._backoff_min
         
         while self._running:
             try:
@@ -218,34 +300,43 @@ class EvccWebsocketClient:
                     ping_interval=WS_PING_INTERVAL,  # ⭐ Heartbeat
                     ping_timeout=WS_PING_TIMEOUT,    # ⭐ Ping-Timeout
                     max_size=WS_MAX_SIZE,             # ⭐ Max Message Size
+                    compression=None,                 # ⭐ Kein permessage-deflate (spart Dekomprimierung pro Frame)
                 ) as ws:
                     self._ws = ws
                     _LOGGER.info("✅ EVCC WebSocket verbunden!")
-                    backoff = self._backoff_base  # Reset nach erfolgreichem Connect
+                    backoff = self._backoff_min  # Reset nach erfolgreichem Connect
+                    
+                    # Log-Level einmal pro Verbindung prüfen statt pro Frame
+                    debug = _LOGGER.isEnabledFor(logging.DEBUG)
                     
                     async for msg in ws:
+                        # Günstiger Vorfilter auf dem Roh-Frame: irrelevante
+                        # Nachrichten werden gar nicht erst als JSON geparst
+                        if not self._may_be_relevant(msg):
+                            continue
                         try:
-                            data = json.loads(msg)
+                            data = json_loads(msg)
                             
-                            # Filtere relevante Nachrichten
-                            if self._is_relevant_update(data):
-                                _LOGGER.debug("Relevante WS-Nachricht empfangen")
+                            # Filtere relevante Nachrichten (liefert den site-Teil)
+                            site = self._is_relevant_update(data)
+                            if site is not None:
+                                if debug:
+                                    _LOGGER.debug("Relevante WS-Nachricht empfangen")
                                 
                                 # Deduplication: Skip wenn gleiche Daten wie zuletzt
-                                signature = self._signature(data)
+                                signature = self._signature(site)
                                 if signature == self._last_signature:
-                                    _LOGGER.debug("Duplicate WS-Nachricht ignoriert")
+                                    if debug:
+                                        _LOGGER.debug("Duplicate WS-Nachricht ignoriert")
                                     continue
                                 self._last_signature = signature
                                 
-                                # Schreibe in asynce Queue (non-blocking)
-                                if not self._message_queue.full():
-                                    await self._message_queue.put(data)
-                                else:
-                                    _LOGGER.warning("WS-Message Queue voll; Nachricht wird verworfen")
+                                # Neueste Werte ablegen (non-blocking, ältere werden überschrieben)
+                                self._store_latest(signature)
                         
                         except json.JSONDecodeError:
-                            _LOGGER.debug("Nicht-JSON WS-Nachricht ignoriert")
+                            if debug:
+                                _LOGGER.debug("Nicht-JSON WS-Nachricht ignoriert")
                         except Exception as e:
                             _LOGGER.error("Fehler bei WS-Nachrichtenverarbeitung: %s", e)
             
@@ -256,7 +347,7 @@ class EvccWebsocketClient:
                 sleep_for = self._next_backoff(backoff)
                 _LOGGER.debug("Backoff nach WS-Fehler: %.2fs", sleep_for)
                 await asyncio.sleep(sleep_for)
-                backoff = min(backoff * 2, self._backoff_max)
+                backoff = min(backoff * self._backoff_factor, self._backoff_max)
             
             except asyncio.CancelledError:
                 _LOGGER.debug("WebSocket-Run-Task abgebrochen")
@@ -269,125 +360,160 @@ class EvccWebsocketClient:
                 sleep_for = self._next_backoff(backoff)
                 _LOGGER.debug("Backoff nach Fehler: %.2fs", sleep_for)
                 await asyncio.sleep(sleep_for)
-                backoff = min(backoff * 2, self._backoff_max)
+                backoff = min(backoff * self._backoff_factor, self._backoff_max)
+    
+    def _store_latest(self, values: tuple):
+        """Lege die neuesten Werte ab (latest-wins pro Feld)
+
+        EVCC sendet Teil-Updates (z.B. nur grid oder nur pvEnergy), daher wird
+        pro Feld zusammengeführt: ein späteres grid.power überschreibt ein noch
+        nicht verarbeitetes früheres, lässt ein wartendes pvEnergy aber stehen.
+        """
+        grid_power, pv_energy = values
+        if grid_power is None and pv_energy is None:
+            return
+        
+        if grid_power is not None:
+            self._latest_power = grid_power
+        if pv_energy is not None:
+            self._latest_energy = pv_energy
+        self._latest_event.set()
     
     async def _consume_messages(self):
-        """Separate Task: Verarbeite Nachrichten aus der Queue"""
-        while self._running or not self._message_queue.empty():
+        """Separate Task: Verarbeite die jeweils neuesten Werte"""
+        while self._running:
             try:
-                data = await self._message_queue.get()
-                await self.coordinator_callback(data)
+                await self._latest_event.wait()
+                self._latest_event.clear()
+                grid_power, pv_energy = self._latest_power, self._latest_energy
+                self._latest_power = self._latest_energy = None
+                await self.coordinator_callback(grid_power, pv_energy)
+                
+                # Werte, die bis zum nächsten Takt eintreffen, werden zusammengefasst,
+                # nur der jeweils neueste Wert landet im Register
+                await asyncio.sleep(WS_FLUSH_INTERVAL)
             except asyncio.CancelledError:
                 _LOGGER.debug("Consumer-Task abgebrochen")
                 break
             except Exception as err:
                 _LOGGER.error("Fehler im Consumer-Task: %s", err)
-            finally:
-                self._message_queue.task_done()
     
-    def _clear_queue(self):
-        """Leere die Message Queue"""
-        while not self._message_queue.empty():
-            try:
-                self._message_queue.get_nowait()
-                self._message_queue.task_done()
-            except asyncio.QueueEmpty:
-                break
+    def _clear_latest(self):
+        """Verwerfe noch nicht verarbeitete Werte"""
+        self._latest_power = self._latest_energy = None
+        self._latest_event.clear()
+    
+    def _next_backoff(self, current: float) -> float:
+        """Wartezeit vor dem nächsten Verbindungsversuch (Exponential Backoff mit Jitter)
+
+        Erster Fehler (current == Minimum): zufällig 0..WS_BACKOFF_INITIAL Sekunden,
+        damit nach einem EVCC-Neustart nicht alle Clients gleichzeitig reconnecten.
+        Danach wird current gewartet; der Aufrufer multipliziert mit WS_BACKOFF_FACTOR.
+        """
+        if current == self._backoff_min:
+            return random.random() * self._backoff_initial
+        return current
     
-    def _next_backoff(self, current: int) -> float:
-        """Exponential Backoff mit Jitter"""
-        jitter = random.uniform(0, current)
-        return min(current + jitter, self._backoff_max)
+    def _may_be_relevant(self, msg) -> bool:
+        """Schneller Substring-Check auf dem Roh-Frame (vor dem JSON-Parsing)"""
+        keys = _RELEVANT_KEYS_BYTES if isinstance(msg, bytes) else _RELEVANT_KEYS
+        return any(key in msg for key in keys)
     
-    def _is_relevant_update(self, data: dict) -> bool:
-        """Filtere nur relevante EVCC-Updates (Power, Energy)"""
+    def _is_relevant_update(self, data):
+        """Filtere nur relevante EVCC-Updates (Power, Energy)
+
+        Gibt den site-Teil der Nachricht zurück (oder None, wenn irrelevant),
+        damit nachfolgende Schritte "site" nicht erneut nachschlagen müssen.
+        """
         if not isinstance(data, dict):
-            return False
+            return None
         
         # Akzeptiere "site" oder direkt grid/pvEnergy Updates
-        if "site" in data:
-            return True
+        site = data.get("site")
+        if site is not None:
+            return site if isinstance(site, dict) else None
         if "grid" in data or "pvEnergy" in data:
-            return True
+            return data
         
-        return False
+        return None
     
-    def _signature(self, data: dict) -> str:
-        """Erstelle Hash der Nachrichten-Inhalte für Deduplication"""
-        try:
-            return json.dumps(data, sort_keys=True)
-        except Exception:
-            return str(data)
+    def _signature(self, site: dict) -> tuple:
+        """Fingerprint für Deduplication: nur die tatsächlich genutzten Werte
+
+        Statt die komplette Nachricht zu serialisieren, werden nur grid.power
+        und pvEnergy verglichen (None = in der Nachricht nicht enthalten).
+        """
+        grid = site.get("grid")
+        grid_power = grid.get("power") if isinstance(grid, dict) else None
+        return grid_power, site.get("pvEnergy")
 
 async def evcc_websocket_worker():
-    """Asynchroner WebSocket-Worker mit Message Queue"""
+    """Asynchroner WebSocket-Worker mit Latest-Wins Puffer"""
     global current_power_w, current_energy_kwh, ws_client
     
     ws_client = EvccWebsocketClient(EVCC_HOST, EVCC_WS_PORT, handle_evcc_update)
-    await ws_client.connect()
-    await ws_client.wait()
+    try:
+        await ws_client.connect()
+        await ws_client.wait()
+    except Exception as e:
+        # Fehler im Worker dürfen den Modbus Server nicht beenden
+        _LOGGER.error("WebSocket-Worker Fehler: %s", e)
 
-async def handle_evcc_update(data):
-    """Callback: Verarbeite EVCC-Updates"""
+async def handle_evcc_update(grid_power, pv_energy):
+    """Callback: Verarbeite EVCC-Updates (None = Wert nicht aktualisiert)"""
     global current_power_w, current_energy_kwh
     
+    # Debug-Level einmal prüfen statt bei jedem einzelnen Debug-Aufruf
+    debug = _LOGGER.isEnabledFor(logging.DEBUG)
+    
     try:
-        if "site" in data:
-            site = data["site"]
-        else:
-            site = data
-        _LOGGER.debug("EVCC update empfangen: keys=%s", list(site.keys()))
-
-            
+        # Werte kommen direkt aus dem Latest-Wins Puffer (grid.power, pvEnergy)
+        if debug:
+            _LOGGER.debug("EVCC update empfangen: grid.power=%s, pvEnergy=%s", grid_power, pv_energy)
+        
         # Leistung: grid.power (Einspeisung = negativ, Bezug = positiv)
         # WR zeigt Einspeisung als positive Zahl → Vorzeichen umkehren
         power_value = None
-        power_source = None
+        changed = False
         
-        if "grid" in site and isinstance(site["grid"], dict) and "power" in site["grid"]:
-            grid_power = site["grid"]["power"]
+        if grid_power is not None:
             # Negatives grid.power = Einspeisung → positive WR-Leistung
             # Positives grid.power = Bezug → WR-Leistung = 0
             power_value = -grid_power if grid_power < 0 else 0
-            power_source = f"grid.power ({grid_power:.1f}W)"
 
         if power_value is not None:
             old_power = current_power_w
             current_power_w = max(0, int(power_value))
             if current_power_w != old_power:
-                _LOGGER.info("Power aktualisiert: %d W → %d W (Quelle: %s)", old_power, current_power_w, power_source)
-            _LOGGER.debug("EVCC %s: %s W → Register 0x9C93=%d", power_source, power_value, current_power_w)
+                changed = True
+                _LOGGER.info("Power aktualisiert: %d W → %d W (Quelle: grid.power (%.1fW))", old_power, current_power_w, grid_power)
+            if debug:
+                _LOGGER.debug("EVCC grid.power (%.1fW): %s W → Register 0x9C93=%d", grid_power, power_value, current_power_w)
         
         # Energie (kWh)
-        if "pvEnergy" in site:
-            current_energy_kwh = float(site["pvEnergy"])
-            _LOGGER.debug("Energy aktualisiert: %.2f kWh", current_energy_kwh)
-            _LOGGER.debug("EVCC pvEnergy: %.3f kWh", current_energy_kwh)
+        if pv_energy is not None:
+            old_energy = current_energy_kwh
+            current_energy_kwh = float(pv_energy)
+            changed = changed or current_energy_kwh != old_energy
+            if debug:
+                _LOGGER.debug("Energy aktualisiert: %.2f kWh", current_energy_kwh)
+                _LOGGER.debug("EVCC pvEnergy: %.3f kWh", current_energy_kwh)
+        
+        # Register nur neu schreiben, wenn sich ein Wert geändert hat
+        if not changed:
+            return
         
         update_registers_from_values()
-        _LOGGER.debug(
-            "Register aktualisiert: 0x9C93=%d W, 0x9C9D=%.3f kWh",
-            current_power_w,
-            current_energy_kwh,
-        )
+        if debug:
+            _LOGGER.debug(
+                "Register aktualisiert: 0x9C93=%d W, 0x9C9D=%.3f kWh",
+                current_power_w,
+                current_energy_kwh,
+            )
     
     except Exception as e:
         _LOGGER.error("Fehler bei EVCC-Update-Verarbeitung: %s", e)
 
-def run_evcc_websocket():
-    """Starte WebSocket-Worker in eigenem Event Loop (für threading)"""
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    
-    try:
-        loop.run_until_complete(evcc_websocket_worker())
-    except KeyboardInterrupt:
-        _LOGGER.info("WebSocket-Worker durch Benutzer gestoppt")
-    except Exception as e:
-        _LOGGER.error("WebSocket-Worker Fehler: %s", e)
-    finally:
-        loop.close()
-
 # ====================================================
 # Globale WebSocket-Instanz
 # ====================================================
@@ -398,7 +524,6 @@ ws_client = None
 # ====================================================
 
 register_data = {}
-sunspec_registers = {}  # Globales Register-Dict (für Updates)
 
 # ========== FESTE WR-IDENTITÄT ==========
 # Diese Register bleiben immer konstant
@@ -423,11 +548,13 @@ power_w = int(current_power_w) & 0xFFFF
 register_data[AC_POWER_ADDR] = [power_w, 0x0000]
 
 # ---- 0x9C9D (40189): Total Energy 32-bit (dynamisch aus EVCC)
-energy_wh = int(current_energy_kwh * 1000)
-energy_hi = (energy_wh >> 16) & 0xFFFF
-energy_lo = energy_wh & 0xFFFF
+energy_hi, energy_lo = energy_to_regs(current_energy_kwh)
 register_data[TOTAL_ENERGY_ADDR] = [energy_hi, energy_lo, 0x0000]
 
+# Startwerte stehen bereits in den Registern → identische Updates überspringen
+_last_power_w = current_power_w
+_last_energy_kwh = current_energy_kwh
+
 # ---- 0x9CA2 (40167): VPV1 (DC Voltage)
 register_data[VPV1_ADDR] = [600, 0x0000]
 
@@ -438,34 +565,43 @@ register_data[TEMPERATURE_ADDR] = [WR_TEMPERATURE * 10, 0x8000, 0x8000, 0xFFFF]
 # Holding Register Array bauen
 # ====================================================
 
-# Das größte Register bestimmen
+# Adressbereich bestimmen: kleinstes Register bis Ende der SunSpec-Map
+# (nicht nur bis zum letzten belegten Block: Clients lesen das komplette
+# Model 103 bzw. 125 Register am Stück ab 0x9C40, nicht belegte Register = 0)
 if register_data:  # Nur wenn register_data nicht leer ist
-    max_reg_addr = max(register_data.keys())
-    max_length = max(len(v) for v in register_data.values())
-    max_addr = max_reg_addr + max_length + 10
+    register_base = min(register_data.keys())
+    register_end = max(
+        SUNSPEC_MAP_END,
+        max(addr + len(values) for addr, values in register_data.items()),
+    )
 else:
     # Fallback wenn register_data leer ist
     _LOGGER.error("❌ KRITISCHER FEHLER: register_data ist leer! Konstanten nicht importiert?")
-    max_addr = 0x10000  # Default große Größe
+    register_base = 0
+    register_end = 0x10000  # Default große Größe
 
 # Array mit Nullen initialisieren
-# pymodbus ModbusSequentialDataBlock(0, values): values[i] = Modbus-Register i
-# ABER: Beim Lesen gibt es einen OFF-BY-ONE Bug in pymodbus!
-# Lösung: Wir schreiben mit +1 Offset
-holding = [0] * (max_addr + 2)
-
-# Register eintragen (mit +1 Offset für pymodbus-Kompatibilität)
+# Das Array deckt nur den SunSpec-Bereich ab (ca. 130 statt 40000 Einträge):
+# SunSpecDataBlock(register_base, values): values[i] = Modbus-Register register_base + i
+# Der Slave Context läuft mit zero_mode=True → Modbus-Adresse = Datastore-Adresse
+# (ohne zero_mode addiert pymodbus 1 auf jede Adresse, daher früher der +1 Offset)
+# array('H'): uint16 wie die Modbus-Register selbst, ungültige Werte fallen sofort auf
+holding = array('H', [0]) * (register_end - register_base)
+
+# Register eintragen
+# holding reicht bis register_end → alle Blöcke passen, keine Bereichsprüfung nötig
 for addr, values in register_data.items():
-    for idx, val in enumerate(values):
-        target_addr = addr + idx + 1  # +1 Offset NOTWENDIG!
-        if target_addr < len(holding):
-            holding[target_addr] = val
-            sunspec_registers[addr + idx] = val  # Auch ins globale Dict
+    start = addr - register_base
+    holding[start:start + len(values)] = array('H', values)
 
 # Debug: Prüfe ob Werte richtig geschrieben wurden
-print(f"[INIT] SunSpec Identifier (0x9C40) = 0x{holding[SUNSPEC_IDENTIFIER_ADDR+1]:04X} 0x{holding[SUNSPEC_IDENTIFIER_ADDR+2]:04X} (sollte 0x5375 0x6E53)")
-print(f"[INIT] Manufacturer (0x9C44) = 0x{holding[MANUFACTURER_ADDR+1]:04X}")
-print(f"[INIT] Status (0x9CAB) = 0x{holding[INVERTER_STATUS_ADDR+1]:04X}")
+_LOGGER.debug(
+    "[INIT] SunSpec Identifier (0x9C40) = 0x%04X 0x%04X (sollte 0x5375 0x6E53)",
+    get_register(SUNSPEC_IDENTIFIER_ADDR),
+    get_register(SUNSPEC_IDENTIFIER_ADDR + 1),
+)
+_LOGGER.debug("[INIT] Manufacturer (0x9C44) = 0x%04X", get_register(MANUFACTURER_ADDR))
+_LOGGER.debug("[INIT] Status (0x9CAB) = 0x%04X", get_register(INVERTER_STATUS_ADDR))
 
 # ====================================================
 # Fallback-Werte laden wenn LIVE=False
@@ -481,11 +617,19 @@ else:
 # Modbus Slave Context erstellen
 # ====================================================
 
+# Ein Block für Holding und Input Registers: SunSpec-Clients lesen je nach
+# Gerät FC3 oder FC4, beide sollen dieselben Werte sehen
+# served_start=0: wie bisher wird ab Adresse 0 geantwortet (0 bis zur SunSpec-Map)
+sunspec_block = SunSpecDataBlock(register_base, holding, served_start=0)
+
+# Discrete Inputs / Coils nutzt SunSpec nicht → nur Platzhalter mit einem Eintrag
+# (Zugriffe ab Adresse 1 beantwortet pymodbus mit IllegalAddress)
 store = ModbusSlaveContext(
-    di=ModbusSequentialDataBlock(0, [0] * 100),
-    co=ModbusSequentialDataBlock(0, [0] * 100),
-    hr=ModbusSequentialDataBlock(0, holding),  # Holding Registers
-    ir=ModbusSequentialDataBlock(0, holding)   # Input Registers (kopiert HR)
+    di=ModbusSequentialDataBlock(0, [0]),
+    co=ModbusSequentialDataBlock(0, [0]),
+    hr=sunspec_block,  # Holding Registers
+    ir=sunspec_block,  # Input Registers (derselbe Block wie HR)
+    zero_mode=True,                               # Modbus-Adresse 1:1 (kein +1 Offset)
 )
 
 context = ModbusServerContext(slaves=store, single=True)
@@ -494,51 +638,73 @@ context = ModbusServerContext(slaves=store, single=True)
 # TCP Server starten mit WebSocket-Worker (optional)
 # ====================================================
 
-try:
-    print("\n" + "="*70)
-    print(f"🚀 Emulierter SunSpec WR (OpenSource) — {VERSION}")
-    print("="*70)
-    print(f"📡 Modbus TCP Port: {MODBUS_PORT}")
-    print(f"")
-    print(f"🏭 WR-Identität:")
-    print(f"   Manufacturer: {MANUFACTURER}")
-    print(f"   Model: {MODEL}")
-    print(f"   Serial: {SERIAL_NUMBER}")
-    print(f"   Status: {'RUNNING' if WR_STATUS == 0x0002 else 'IDLE'}")
-    print(f"")
-    print(f"⚡ Aktuelle Werte:")
-    print(f"   Total Power: {current_power_w} W")
-    print(f"   Total Energy: {current_energy_kwh:.2f} kWh")
-    print(f"   Temperatur: {WR_TEMPERATURE}°C")
-    print(f"")
+async def main():
+    """Modbus Server und WebSocket-Worker laufen im selben Event Loop (kein Thread)"""
+    workers = []
     
+    # Starte WebSocket-Worker wenn LIVE=True
     if LIVE:
-        print(f"🌐 EVCC WebSocket Connection:")
-        print(f"   URI: {EVCC_WS_URI}")
-        print(f"   Status: {'🟢 Verbindet...' if LIVE else '🔴 DEAKTIVIERT'}")
-    else:
-        print(f"📋 Mode: STATIC (Demo-Werte)")
+        workers.append(evcc_websocket_worker())
+        print("[MAIN] ✅ EVCC WebSocket-Worker gestartet (mit Reconnect & Latest-Wins Puffer)\n")
     
-    print(f"")
-    print(f"📝 SunSpec Register:")
-    print(f"   0x9C40 = Identifier ('SunS')")
-    print(f"   0x9C44 = Manufacturer")
-    print(f"   0x9C74 = Serial Number")
-    print(f"   0x9C93 = AC Total Power (dynamisch)")
-    print(f"   0x9C9D = Total Energy (dynamisch)")
-    print(f"   0x9CAB = Status")
-    print("="*70 + "\n")
+    # Starte Modbus Server (läuft bis zum Beenden)
+    workers.append(StartTcpServer(context, address=(MODBUS_HOST, MODBUS_PORT), defer_start=False))
+    await asyncio.gather(*workers)
+
+# Server nur beim direkten Start, nicht beim Import des Moduls
+# (Register-Abbild und Context stehen auch beim Import zur Verfügung)
+if __name__ == "__main__":
+    try:
+        # Banner in einem Stück ausgeben (ein write statt ~30 einzelner prints,
+        # im Container-Log erscheint der Block zusammenhängend)
+        banner = [
+            "",
+            "="*70,
+            f"🚀 Emulierter SunSpec WR (OpenSource) — {VERSION}",
+            "="*70,
+            f"📡 Modbus TCP Port: {MODBUS_PORT}",
+            "",
+            "🏭 WR-Identität:",
+            f"   Manufacturer: {MANUFACTURER}",
+            f"   Model: {MODEL}",
+            f"   Serial: {SERIAL_NUMBER}",
+            f"   Status: {'RUNNING' if WR_STATUS == 0x0002 else 'IDLE'}",
+            "",
+            "⚡ Aktuelle Werte:",
+            f"   Total Power: {current_power_w} W",
+            f"   Total Energy: {current_energy_kwh:.2f} kWh",
+            f"   Temperatur: {WR_TEMPERATURE}°C",
+            "",
+        ]
     
-    # Starte WebSocket-Worker wenn LIVE=True
-    if LIVE:
-        ws_thread = threading.Thread(target=run_evcc_websocket, daemon=True)
-        ws_thread.start()
-        print("[MAIN] ✅ EVCC WebSocket-Worker gestartet (mit Reconnect & Message Queue)\n")
+        if LIVE:
+            banner += [
+                "🌐 EVCC WebSocket Connection:",
+                f"   URI: {EVCC_WS_URI}",
+                f"   Status: {'🟢 Verbindet...' if LIVE else '🔴 DEAKTIVIERT'}",
+            ]
+        else:
+            banner.append("📋 Mode: STATIC (Demo-Werte)")
+    
+        banner += [
+            "",
+            "📝 SunSpec Register:",
+            "   0x9C40 = Identifier ('SunS')",
+            "   0x9C44 = Manufacturer",
+            "   0x9C74 = Serial Number",
+            "   0x9C93 = AC Total Power (dynamisch)",
+            "   0x9C9D = Total Energy (dynamisch)",
+            "   0x9CAB = Status",
+            "="*70 + "\n",
+        ]
+        # flush: ohne TTY (Docker) puffert stdout, der Banner käme sonst erst
+        # nach den Log-Ausgaben (stderr) oder beim Beenden an
+        sys.stdout.write("\n".join(banner) + "\n")
+        sys.stdout.flush()
     
-    # Starte Modbus Server (blockierend)
-    StartTcpServer(context, address=(MODBUS_HOST, MODBUS_PORT))
+        asyncio.run(main())
     
-except KeyboardInterrupt:
-    print("\n\n[INFO] Server gestoppt (CTRL+C).")
-except Exception as e:
-    print(f"\n[ERROR] Server-Fehler: {e}")
+    except KeyboardInterrupt:
+        print("\n\n[INFO] Server gestoppt (CTRL+C).")
+    except Exception as e:
+        _LOGGER.error("Server-Fehler: %s", e)